@@ -3,16 +3,37 @@
 
 # Standard library
 from unittest.mock import patch
+from itertools import count
+from copy import copy
+import pickle
+import re
+import json
+import os
+import subprocess
+import sys
+from os.path import dirname, abspath, join
+from statistics import mean
 
 # PyPi
-# import pytest
+import pytest
+import numpy as np
+from PIL import Image
+from mss.screenshot import ScreenShot
 
 # This project
 import bot as b
 
 
 def almost_equal(value_1, value_2, eps):
-    return (value_1 + eps >= value_2) and (value_2 - eps <= value_1)
+    if isinstance(value_1, b.Vector):
+        return almost_equal(value_1.x, value_2.x, eps) and almost_equal(
+            value_1.y, value_2.y, eps
+        )
+    return abs(value_1 - value_2) <= eps
+
+
+def components(vector):
+    return (vector.x, vector.y)
 
 
 class TestVector:
@@ -33,6 +54,31 @@ class TestVector:
         assert b.Vector(0, 0) / b.Vector(10, 20) == b.Vector(0, 0)
         assert b.Vector(10, 16) / 2 == b.Vector(5, 8)
 
+    def test_numpy_scalars(self):
+        assert np.float64(2) * b.Vector(1, 2) == b.Vector(2.0, 4.0)
+        assert b.Vector(1, 2) + np.int32(3) == b.Vector(4, 5)
+        assert np.float32(1) - b.Vector(1, 2) == b.Vector(0.0, -1.0)
+        assert b.Vector(1, 2) / np.int64(2) == b.Vector(0.5, 1.0)
+        with pytest.raises(NotImplementedError):
+            b.Vector(1, 2) + "3"
+        with pytest.raises(NotImplementedError):
+            b.Vector(1, 2) * True
+
+    def test_value_semantics(self):
+        vector = b.Vector(1, 2)
+        with pytest.raises(b.FrozenInstanceError):
+            vector.x = 3
+        assert vector != (1, 2)
+        assert b.Vector() == b.Vector(x=0, y=0)
+        assert hash(vector) == hash(b.Vector(1, 2))
+        assert sorted([b.Vector(2, 0), b.Vector(1, 5), b.Vector(1, 3)]) == [
+            b.Vector(1, 3),
+            b.Vector(1, 5),
+            b.Vector(2, 0),
+        ]
+        assert copy(vector) == vector
+        assert pickle.loads(pickle.dumps(vector)) == vector
+
 
 class TestTimeRecordedValue:
     @patch("bot.time")
@@ -47,6 +93,10 @@ class TestTimeRecordedValue:
         assert tv.value == "bar"
         assert tv.time == 1544891345
 
+        tv.set("baz", 1544891300.5)
+        assert tv.value == "baz"
+        assert tv.time == 1544891300.5
+
 
 class TestChangeRecordedValue:
     @patch("bot.time")
@@ -101,9 +151,8 @@ class TestMovableObject:
     def test_constant_velocity(self, time):
         iterations = 10
         start_time = 1544891730
-        time.side_effect = map(
-            lambda i: start_time + (0.3333 * i), range(iterations + 26)
-        )
+        # one time() call per position
+        time.side_effect = map(lambda i: start_time + i, range(iterations + 1))
         position = b.Vector(10, 10)
         atom = b.MovableObject(position)
 
@@ -120,30 +169,106 @@ class TestMovableObject:
             position += step_vector
             atom.position = position
             assert atom.position == expected_positions[i]
-            assert almost_equal(atom.velocity, b.Vector(4.0, 4.0), 0.001)
-            if i == 0:
-                assert almost_equal(atom.acceleration, b.Vector(4, 4), 0.001)
-            else:
-                assert almost_equal(atom.acceleration, b.Vector(0, 0), 0.001)
+            assert np.allclose(components(atom.velocity), (4, 4), atol=1e-3)
+            assert np.allclose(
+                components(atom.acceleration), (0, 0), atol=1e-3
+            )
 
     def test_constant_acceleration(self, time):
         iterations = 10
         start_time = 1544891730
-        time.side_effect = map(
-            lambda i: start_time + (0.3333 * i), range(iterations + 26)
-        )
+        time.side_effect = map(lambda i: start_time + i, range(iterations + 1))
         position = b.Vector(10, 10)
         atom = b.MovableObject(position)
 
         acceleration = b.Vector(8, 8)
         step_vector = b.Vector(8, 8)
-        for _ in range(iterations):
+        for i in range(iterations):
             position += step_vector
             atom.position = position
-            assert almost_equal(atom.acceleration, b.Vector(8, 8), 0.001)
+            if i > 0:
+                # a line is fitted to the first two positions, the
+                # positions are 10 + 4 * t * (t + 1)
+                velocity = 8 * (i + 1) + 4
+                assert np.allclose(
+                    components(atom.velocity), (velocity, velocity), atol=1e-3
+                )
+                assert np.allclose(
+                    components(atom.acceleration), (8, 8), atol=1e-3
+                )
 
             step_vector += acceleration
 
+    def test_injected_time(self, time):
+        start_time = 1544891730
+        atom = b.MovableObject(b.Vector(10, 10), start_time)
+        for i in range(1, 10):
+            # positions of a constant acceleration of (8, 8)
+            atom.set_position(
+                b.Vector(10, 10) + b.Vector(4, 4) * (i * i), start_time + i
+            )
+            assert atom.position_time == start_time + i
+            if i > 1:
+                assert np.allclose(
+                    components(atom.velocity), (8 * i, 8 * i), atol=1e-3
+                )
+                assert np.allclose(
+                    components(atom.acceleration), (8, 8), atol=1e-3
+                )
+        time.assert_not_called()
+
+
+class TestKalmanBallTracker:
+    def test_constant_acceleration(self):
+        def true_position(t):
+            return b.Vector(100 + 300 * t, 50 - 400 * t + 450 * t * t)
+
+        tracker = b.KalmanBallTracker(
+            true_position(0), 0.0, gravity=b.Vector(0, 900)
+        )
+        for i in range(1, 30):
+            tracker.set_position(true_position(i / 27), i / 27)
+
+        t = 29 / 27
+        assert tracker.position_time == t
+        assert np.allclose(
+            (tracker.position.x, tracker.position.y),
+            (true_position(t).x, true_position(t).y),
+            atol=0.5,
+        )
+        assert np.allclose(
+            (tracker.velocity.x, tracker.velocity.y),
+            (300, -400 + 900 * t),
+            atol=5,
+        )
+        assert np.allclose(
+            (tracker.acceleration.x, tracker.acceleration.y), (0, 900), atol=20
+        )
+        predicted = tracker.predict(t + 0.1)
+        assert np.allclose(
+            (predicted.x, predicted.y),
+            (true_position(t + 0.1).x, true_position(t + 0.1).y),
+            atol=1,
+        )
+        assert tracker.predicted_position(t + 0.1) == predicted
+
+    def test_smoother_than_movable_object(self):
+        rng = np.random.default_rng(8)
+        tracker = b.KalmanBallTracker(b.Vector(0, 0), 0.0)
+        atom = b.MovableObject(b.Vector(0, 0), 0.0)
+        (tracker_errors, atom_errors) = ([], [])
+        for i in range(1, 60):
+            t = i / 27
+            measured = b.Vector(
+                200 * t + rng.normal(0, 1), 300 * t * t + rng.normal(0, 1)
+            )
+            tracker.set_position(measured, t)
+            atom.set_position(measured, t)
+            if i > 10:
+                tracker_errors.append(abs(tracker.acceleration.y - 600))
+                atom_errors.append(abs(atom.acceleration.y - 600))
+        assert mean(tracker_errors) < mean(atom_errors) / 2
+
 
 class TestScreenSection:
     def test(self):
@@ -155,3 +280,1119 @@ class TestScreenSection:
         )
         assert screen_section.width == 842 - 70
         assert screen_section.height == 1080 - 52
+
+    def test_sub_section(self):
+        screen_section = b.ScreenSection(
+            b.Vector(70, 52),
+            b.Vector(842, 52),
+            b.Vector(70, 1080),
+            b.Vector(842, 1080),
+        )
+        sub_section = screen_section.sub_section(10, 20, 110, 220)
+        assert sub_section.mss_compatible_format == {
+            "left": 90,
+            "top": 62,
+            "width": 200,
+            "height": 100,
+        }
+
+
+def sum_matrix_per_pixel(image, locator):
+    """
+    reference summed-area table built with the per-pixel recurrence
+    """
+    (width, height) = image.size
+    sum_matrix = np.zeros((height, width), np.float64)
+    for i in range(height):
+        for j in range(width):
+            pixel = image.getpixel((j, i))
+            sum_matrix[i, j] = locator._calculate_pixel_intensity(pixel)
+            if i > 0:
+                sum_matrix[i, j] += sum_matrix[i - 1, j]
+            if j > 0:
+                sum_matrix[i, j] += sum_matrix[i, j - 1]
+            if (i > 0) and (j > 0):
+                sum_matrix[i, j] -= sum_matrix[i - 1, j - 1]
+    return sum_matrix
+
+
+def screen_section_of_size(width, height):
+    return b.ScreenSection(
+        b.Vector(0, 0),
+        b.Vector(width, 0),
+        b.Vector(0, height),
+        b.Vector(width, height),
+    )
+
+
+def frame_with_ball(width, height, center, radius):
+    """
+    white RGB frame with a black disc at center
+    """
+    frame = np.full((height, width, 3), 255, np.uint8)
+    (ys, xs) = np.mgrid[:height, :width]
+    disc = (xs - center.x) ** 2 + (ys - center.y) ** 2 <= radius ** 2
+    frame[disc] = 0
+    return frame
+
+
+@patch("bot._mss_module")
+class TestBallLocator:
+    def test_fill_sum_matrix(self, mss_module):
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (23, 31, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels, "RGB")
+        locator = b.BallLocator(screen_section_of_size(31, 23))
+
+        locator._fill_sum_matrix(image)
+
+        expected = sum_matrix_per_pixel(image, locator)
+        assert np.allclose(locator._sum_matrix[1:, 1:], expected)
+        assert not locator._sum_matrix[0, :].any()
+        assert not locator._sum_matrix[:, 0].any()
+
+    def test_fill_sum_matrix_recorded_frames(self, mss_module):
+        project_root = dirname(dirname(dirname(abspath(__file__))))
+        frame_directory = join(project_root, "recorded_frames")
+        frame_paths = [join(frame_directory, f"image{i}.png") for i in (0, 1)]
+        if not all(map(os.path.isfile, frame_paths)):
+            pytest.skip("recorded frames are not available")
+
+        for frame_path in frame_paths:
+            image = Image.open(frame_path).convert("RGB")
+            # the per-pixel reference is slow, compare a crop of the frame
+            image = image.crop((0, 0, 160, 120))
+            locator = b.BallLocator(screen_section_of_size(160, 120))
+
+            locator._fill_sum_matrix(image)
+
+            expected = sum_matrix_per_pixel(image, locator)
+            assert np.allclose(locator._sum_matrix[1:, 1:], expected)
+
+    def test_numpy_capture_matches_pil_capture(self, mss_module):
+        rng = np.random.default_rng(1)
+        bgra = rng.integers(0, 256, (23, 31, 4), dtype=np.uint8)
+        screenshot = ScreenShot.from_size(bytearray(bgra.tobytes()), 31, 23)
+        mss_module.return_value.mss.return_value.grab.return_value = screenshot
+        section = screen_section_of_size(31, 23)
+        numpy_locator = b.BallLocator(section, capture_mode="numpy")
+        pil_locator = b.BallLocator(section, capture_mode="pil")
+
+        frame = numpy_locator._grab_frame(section)
+        assert frame.shape == (23, 31, 4)
+        assert np.shares_memory(frame, np.frombuffer(screenshot.raw, np.uint8))
+
+        numpy_locator.locate_ball()
+        pil_locator.locate_ball()
+        assert np.allclose(numpy_locator._sum_matrix, pil_locator._sum_matrix)
+
+    def test_unknown_capture_mode(self, mss_module):
+        with pytest.raises(ValueError):
+            b.BallLocator(screen_section_of_size(4, 4), capture_mode="bmp")
+
+    def test_locate_ball_in_frame(self, mss_module):
+        section = b.ScreenSection(
+            b.Vector(70, 52),
+            b.Vector(470, 52),
+            b.Vector(70, 352),
+            b.Vector(470, 352),
+        )
+        locator = b.BallLocator(section, ball_radius=10)
+        frame = frame_with_ball(400, 300, b.Vector(120, 80), 10)
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position, b.Vector(190, 132), 0.5)
+        empty_frame = np.full((300, 400, 3), 255, np.uint8)
+        assert locator.locate_ball_in_frame(empty_frame) is None
+
+    def test_locate_ball_sub_pixel(self, mss_module):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(section, ball_radius=10)
+        frame = frame_with_ball(400, 300, b.Vector(120.5, 80.5), 10)
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position, b.Vector(120.5, 80.5), 0.05)
+
+    def test_locate_ball_next_to_dark_region(self, mss_module):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(section, ball_radius=10)
+        frame = frame_with_ball(400, 300, b.Vector(300, 200), 10)
+        frame[20:120, 20:220] = 0
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position, b.Vector(300, 200), 0.5)
+
+    def test_locate_ball_at_edge(self, mss_module):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(section, ball_radius=10)
+        frame = frame_with_ball(400, 300, b.Vector(393, 150), 10)
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position.y, 150, 0.5)
+        assert 388 <= position.x <= 399
+
+    @patch("bot.time")
+    def test_tracking(self, time, mss_module):
+        time.side_effect = count(1544891730)
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(section, tracking=True, ball_radius=10)
+        frame = frame_with_ball(400, 300, b.Vector(120, 80), 10)
+
+        near_ball = b.MovableObject(b.Vector(125, 75))
+        position = locator.locate_ball_in_frame(frame, near_ball)
+        assert almost_equal(position, b.Vector(120, 80), 0.5)
+        assert (locator.tracking_hits, locator.tracking_misses) == (1, 0)
+
+        far_ball = b.MovableObject(b.Vector(350, 250))
+        position = locator.locate_ball_in_frame(frame, far_ball)
+        assert almost_equal(position, b.Vector(120, 80), 0.5)
+        assert (locator.tracking_hits, locator.tracking_misses) == (1, 1)
+
+    @pytest.mark.parametrize("pyramid_depth", [0, 3])
+    def test_tracking_rejects_ball_cut_by_window(
+        self, mss_module, pyramid_depth
+    ):
+        section = screen_section_of_size(772, 1028)
+        locator = b.BallLocator(
+            section, tracking=True, ball_radius=45, pyramid_depth=pyramid_depth
+        )
+        frame = frame_with_ball(772, 1028, b.Vector(400, 500), 45)
+
+        # the prediction is 1.5 ball radii off, the window cuts the ball
+        off_ball = b.MovableObject(b.Vector(468, 500), 1544891730.0)
+        position = locator.locate_ball_in_frame(frame, off_ball, 1544891730.0)
+
+        assert almost_equal(position, b.Vector(400, 500), 0.5)
+        assert (locator.tracking_hits, locator.tracking_misses) == (0, 1)
+
+    @patch("bot.time")
+    def test_tracking_grabs_window_only(self, time, mss_module):
+        time.side_effect = count(1544891730)
+        screen = np.dstack(
+            [frame_with_ball(600, 500, b.Vector(190, 132), 10)]
+            + [np.zeros((500, 600), np.uint8)]
+        )
+
+        def grab(monitor):
+            (left, top) = (monitor["left"], monitor["top"])
+            (width, height) = (monitor["width"], monitor["height"])
+            pixels = screen[top : top + height, left : left + width]
+            return ScreenShot.from_size(
+                bytearray(pixels.tobytes()), width, height
+            )
+
+        mss_module.return_value.mss.return_value.grab.side_effect = grab
+        section = b.ScreenSection(
+            b.Vector(70, 52),
+            b.Vector(470, 52),
+            b.Vector(70, 352),
+            b.Vector(470, 352),
+        )
+        locator = b.BallLocator(section, tracking=True, ball_radius=10)
+        ball = b.MovableObject(b.Vector(195, 128))
+
+        position = locator.locate_ball(ball)
+
+        assert almost_equal(position, b.Vector(190, 132), 0.5)
+        assert (locator.tracking_hits, locator.tracking_misses) == (1, 0)
+        grabbed = mss_module.return_value.mss.return_value.grab.call_args[0][0]
+        assert grabbed["width"] < section.width
+        assert grabbed["height"] < section.height
+
+    @patch("bot.time")
+    def test_tracking_miss_restamps_frame(self, time, mss_module):
+        time.side_effect = count(1544891730)
+        screen = np.dstack(
+            [frame_with_ball(400, 300, b.Vector(120, 80), 10)]
+            + [np.zeros((300, 400), np.uint8)]
+        )
+
+        def grab(monitor):
+            (left, top) = (monitor["left"], monitor["top"])
+            (width, height) = (monitor["width"], monitor["height"])
+            pixels = screen[top : top + height, left : left + width]
+            return ScreenShot.from_size(
+                bytearray(pixels.tobytes()), width, height
+            )
+
+        mss_module.return_value.mss.return_value.grab.side_effect = grab
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(section, tracking=True, ball_radius=10)
+        far_ball = b.MovableObject(b.Vector(350, 250), 1544891729)
+
+        position = locator.locate_ball(far_ball)
+
+        assert almost_equal(position, b.Vector(120, 80), 0.5)
+        assert locator.tracking_misses == 1
+        # stamped when the whole section was grabbed, not the window
+        assert locator.frame_time == 1544891731
+
+    @pytest.mark.parametrize("pyramid_depth", [1, 2, 3])
+    def test_pyramid(self, mss_module, pyramid_depth):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(
+            section, ball_radius=20, pyramid_depth=pyramid_depth
+        )
+        frame = frame_with_ball(400, 300, b.Vector(253, 171), 20)
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position, b.Vector(253, 171), 0.5)
+        empty_frame = np.full((300, 400, 3), 255, np.uint8)
+        assert locator.locate_ball_in_frame(empty_frame) is None
+
+    @pytest.mark.parametrize("pyramid_depth", [0, 2])
+    def test_fft_engine(self, mss_module, pyramid_depth):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(
+            section,
+            ball_radius=10,
+            pyramid_depth=pyramid_depth,
+            detection_engine="fft",
+        )
+        frame = frame_with_ball(400, 300, b.Vector(300.5, 200.5), 10)
+        frame[20:120, 20:220] = 0
+
+        position = locator.locate_ball_in_frame(frame)
+
+        assert almost_equal(position, b.Vector(300.5, 200.5), 0.05)
+        empty_frame = np.full((300, 400, 3), 255, np.uint8)
+        assert locator.locate_ball_in_frame(empty_frame) is None
+        # one set of template spectra per FFT size and radius
+        assert len(locator._template_spectra_cache) == pyramid_depth // 2 + 1
+
+    def test_fft_template_cache_is_bounded(self, mss_module):
+        section = screen_section_of_size(400, 300)
+        locator = b.BallLocator(
+            section, tracking=True, ball_radius=10, detection_engine="fft"
+        )
+        frame = frame_with_ball(400, 300, b.Vector(200, 150), 10)
+
+        # windows of many shapes, as when the ball speeds up
+        for size in range(30, 150, 6):
+            window = (150 - size, 200 - size, 150 + size, 200 + size)
+            position = locator._locate_ball_in_window(frame, window, section)
+            assert almost_equal(position, b.Vector(200, 150), 0.05)
+
+        cache_size = locator._template_spectra_cache_size
+        assert len(locator._template_spectra_cache) == cache_size
+
+    @pytest.mark.parametrize("pyramid_depth", [0, 2])
+    def test_locate_balls(self, mss_module, pyramid_depth):
+        section = b.ScreenSection(
+            b.Vector(10, 20),
+            b.Vector(410, 20),
+            b.Vector(10, 320),
+            b.Vector(410, 320),
+        )
+        locator = b.BallLocator(
+            section, ball_radius=20, pyramid_depth=pyramid_depth
+        )
+        centers = [b.Vector(253, 171), b.Vector(21.5, 40), b.Vector(390, 290)]
+        frames = np.stack(
+            [frame_with_ball(400, 300, center, 20) for center in centers]
+            + [np.full((300, 400, 3), 255, np.uint8)]
+        )
+
+        positions = locator.locate_balls(frames, batch_size=3)
+
+        assert positions.shape == (4, 2)
+        for frame, position in zip(frames[:3], positions):
+            expected = locator.locate_ball_in_frame(frame)
+            assert np.allclose(position, (expected.x, expected.y))
+        assert np.all(np.isnan(positions[3]))
+
+    def test_locate_balls_full_size_batches(self, mss_module):
+        section = screen_section_of_size(772, 1028)
+        locator = b.BallLocator(section, pyramid_depth=3)
+        centers = [b.Vector(200 + 100 * i, 300 + 150 * i) for i in range(3)]
+        frames = np.stack(
+            [frame_with_ball(772, 1028, center, 45) for center in centers]
+        )
+
+        assert locator._batch_size(1028, 772) > 1
+        positions = locator.locate_balls(frames)
+        positions = locator.locate_balls(frames)
+
+        for center, position in zip(centers, positions):
+            assert np.allclose(position, (center.x, center.y), atol=0.5)
+        # one pyramid for the batches of two frames and one for the last
+        # frame, reused by the second call
+        assert len(locator._batch_pyramid_cache) == 2
+
+    def test_unknown_detection_engine(self, mss_module):
+        with pytest.raises(ValueError):
+            b.BallLocator(
+                screen_section_of_size(4, 4), detection_engine="neural"
+            )
+
+
+class TestFrameQueue:
+    def test_drops_oldest_frame(self):
+        frame_queue = b.FrameQueue(2)
+        for frame in range(3):
+            frame_queue.put(frame)
+        frame_queue.close()
+
+        assert frame_queue.dropped == 1
+        assert frame_queue.get() == 1
+        assert frame_queue.get() == 2
+        assert frame_queue.get() is None
+
+
+class FakeClock:
+    """
+    time advances by a microsecond per time() call, so spin loops end,
+    and by the requested duration per sleep() call, it stands in for both
+    time() and perf_counter()
+    """
+
+    def __init__(self, start_time):
+        self.current_time = start_time
+
+    def time(self):
+        self.current_time += 1e-6
+        return self.current_time
+
+    def sleep(self, duration):
+        self.current_time += duration
+
+
+@pytest.fixture
+def fake_clock():
+    clock = FakeClock(1544891730.0)
+    with patch("bot.time", clock.time), patch(
+        "bot.perf_counter", clock.time
+    ), patch("bot.sleep", clock.sleep):
+        yield clock
+
+
+class TestDeadlineScheduler:
+    def test_wait(self, fake_clock):
+        scheduler = b.DeadlineScheduler(0.1)
+        scheduler.start(1544891730.0)
+
+        wait_times = [scheduler.wait() for _ in range(5)]
+
+        for i, wait_time in enumerate(wait_times):
+            assert almost_equal(wait_time, 1544891730.0 + 0.1 * i, 1e-4)
+        stats = scheduler.stats()
+        assert stats["iterations"] == 5
+        assert stats["missed_deadlines"] == 0
+        assert stats["jitter_max"] < 1e-4
+
+    @pytest.mark.parametrize(
+        "overrun_policy, expected_wait_times, expected_skipped",
+        [
+            ("skip", [0.0, 0.4, 0.5], 3),
+            ("catch_up", [0.0, 0.35, 0.35, 0.35, 0.4], 0),
+            ("rephase", [0.0, 0.35, 0.45], 0),
+        ],
+    )
+    def test_overrun(
+        self,
+        fake_clock,
+        overrun_policy,
+        expected_wait_times,
+        expected_skipped,
+    ):
+        start_time = 1544891730.0
+        scheduler = b.DeadlineScheduler(0.1, overrun_policy=overrun_policy)
+        scheduler.start(start_time)
+
+        wait_times = [scheduler.wait()]
+        fake_clock.sleep(0.35)  # overrun past three deadlines
+        for _ in expected_wait_times[1:]:
+            wait_times.append(scheduler.wait())
+
+        for wait_time, expected in zip(wait_times, expected_wait_times):
+            assert almost_equal(wait_time - start_time, expected, 1e-3)
+        # the deadlines at 0.1, 0.2 and 0.3 passed during the overrun
+        assert scheduler.missed_deadlines == 3
+        assert scheduler.skipped_iterations == expected_skipped
+
+    @pytest.mark.parametrize(
+        "overrun_policy", b.DeadlineScheduler.overrun_policies
+    )
+    def test_late_iteration(self, fake_clock, overrun_policy):
+        start_time = 1544891730.0
+        scheduler = b.DeadlineScheduler(0.1, overrun_policy=overrun_policy)
+        scheduler.start(start_time)
+
+        scheduler.wait()
+        fake_clock.sleep(0.15)  # less than a period past the deadline
+        wait_time = scheduler.wait()
+
+        assert almost_equal(wait_time - start_time, 0.15, 1e-3)
+        assert scheduler.missed_deadlines == 0
+        assert scheduler.skipped_iterations == 0
+
+    def test_wait_ignores_system_clock(self, fake_clock):
+        scheduler = b.DeadlineScheduler(0.1)
+        scheduler.start()
+        scheduler.wait()
+
+        # the system clock is set forward an hour
+        with patch("bot.time", lambda: fake_clock.time() + 3600):
+            scheduler.wait()
+
+        assert scheduler.stats()["jitter_max"] < 1e-4
+        assert scheduler.missed_deadlines == 0
+
+    def test_unknown_overrun_policy(self):
+        with pytest.raises(ValueError):
+            b.DeadlineScheduler(0.1, overrun_policy="panic")
+
+
+class TestFrameRateController:
+    def test_is_new_frame(self):
+        controller = b.FrameRateController(0.04, sample_step=4)
+        frame = np.zeros((32, 32, 4), np.uint8)
+
+        assert controller.is_new_frame(frame)
+        assert not controller.is_new_frame(frame.copy())
+        frame[10:20, 10:20] = 255
+        assert controller.is_new_frame(frame)
+
+    def test_locks_to_frame_rate(self, fake_clock):
+        (vm_period, vm_phase) = (0.04, 0.013)
+        scheduler = b.DeadlineScheduler(1 / 27)
+        controller = b.FrameRateController(1 / 27)
+        scheduler.start(fake_clock.current_time)
+        start_time = fake_clock.current_time
+
+        processed_frames = []
+        for _ in range(400):
+            grab_time = scheduler.wait()
+            vm_frame = int((grab_time - start_time - vm_phase) // vm_period)
+            frame = np.full((64, 64, 4), vm_frame % 256, np.uint8)
+            if controller.update(scheduler, frame, grab_time):
+                processed_frames.append(vm_frame)
+                fake_clock.sleep(0.01)  # processing
+
+        assert abs(controller.period - vm_period) < 0.001
+        # after settling, every rendered frame is processed exactly once
+        assert np.all(np.diff(processed_frames[100:]) == 1)
+        assert controller.duplicate_frames < controller.new_frames / 5
+
+
+class TestStreamingFrameWriter:
+    def test_write(self, tmp_path):
+        rng = np.random.default_rng(2)
+        frames = rng.integers(0, 256, (5, 12, 16, 4), dtype=np.uint8)
+
+        with b.StreamingFrameWriter(str(tmp_path), workers=2) as writer:
+            for i, frame in enumerate(frames):
+                assert writer.write(i, frame)
+
+        assert writer.dropped == 0
+        for i, frame in enumerate(frames):
+            image = Image.open(join(str(tmp_path), f"image{i}.png"))
+            assert np.array_equal(np.asarray(image), frame[:, :, 2::-1])
+
+
+def write_png_recording(directory, frames, times):
+    for i, frame in enumerate(frames):
+        Image.fromarray(frame).save(join(directory, f"image{i}.png"))
+    with open(join(directory, "image_times.log"), "w") as time_log:
+        for frame_time in times:
+            time_log.write(f"{frame_time}\n")
+
+
+class TestFrameArchive:
+    def test_write_and_open(self, tmp_path):
+        path = str(tmp_path / "frames.archive")
+        rng = np.random.default_rng(3)
+        frames = rng.integers(0, 256, (4, 7, 9, 4), dtype=np.uint8)
+        times = 1544891730 + 0.037 * np.arange(4)
+
+        with b.FrameArchive.create(path, 5, (7, 9, 4)) as archive:
+            for frame, frame_time in zip(frames, times):
+                archive.write(frame, frame_time)
+            # the last written frame, not the empty last slot
+            (frame, frame_time) = archive[-1]
+            assert np.array_equal(frame, frames[-1])
+            assert frame_time == times[-1]
+
+        archive = b.FrameArchive.open(path)
+        assert len(archive) == 4
+        assert np.array_equal(archive.frames, frames)
+        assert np.array_equal(archive.times, times)
+        (frame, frame_time) = archive[2]
+        assert np.array_equal(frame, frames[2])
+        assert frame_time == times[2]
+        assert np.shares_memory(frame, archive.frames)
+        with pytest.raises(IndexError):
+            archive[4]
+
+    def test_open_other_file(self, tmp_path):
+        path = tmp_path / "image_times.log"
+        path.write_bytes(b"1544891730.0\n" * 10)
+        with pytest.raises(ValueError):
+            b.FrameArchive.open(str(path))
+
+    def test_convert_to_archive(self, tmp_path):
+        rng = np.random.default_rng(4)
+        frames = rng.integers(0, 256, (3, 7, 9, 3), dtype=np.uint8)
+        times = [1544891730.25, 1544891730.5, 1544891730.75]
+        write_png_recording(str(tmp_path), frames, times)
+
+        b.convert_to_archive(str(tmp_path))
+
+        archive = b.FrameArchive.open(
+            str(tmp_path / b.FrameArchive.default_file_name)
+        )
+        assert np.array_equal(archive.frames[:, :, :, 2::-1], frames)
+        assert np.all(archive.frames[:, :, :, 3] == 255)
+        assert list(archive.times) == times
+        recorded = list(b.read_recorded_frames(str(tmp_path)))
+        assert [frame_time for _, frame_time in recorded] == times
+
+
+class TestReplayFrameSource:
+    def test_png_recording(self, tmp_path):
+        rng = np.random.default_rng(5)
+        frames = rng.integers(0, 256, (6, 7, 9, 3), dtype=np.uint8)
+        times = [1544891730 + 0.037 * i for i in range(6)]
+        write_png_recording(str(tmp_path), frames, times)
+
+        replay = b.ReplayFrameSource(str(tmp_path), read_ahead=2)
+        (frame, frame_time) = replay.next_frame()
+        assert np.array_equal(frame, frames[0])
+        assert frame_time == times[0]
+        assert len(replay._decoding) <= 2
+        recorded = list(replay)
+        assert np.array_equal(np.stack([f for f, _ in recorded]), frames[1:])
+        assert [t for _, t in recorded] == times[1:]
+        with pytest.raises(IndexError):
+            replay.next_frame()
+        replay.close()
+
+    def test_missing_images(self, tmp_path):
+        frames = np.zeros((3, 7, 9, 3), np.uint8)
+        write_png_recording(str(tmp_path), frames, range(3))
+        os.remove(join(str(tmp_path), "image1.png"))
+
+        replay = b.ReplayFrameSource(str(tmp_path))
+
+        assert len(list(replay)) == 1
+        with pytest.raises(IndexError):
+            replay.next_frame()
+        replay.close()
+
+    def test_close_while_decoding(self, tmp_path):
+        frames = np.zeros((6, 7, 9, 3), np.uint8)
+        write_png_recording(str(tmp_path), frames, range(6))
+
+        replay = b.ReplayFrameSource(str(tmp_path), read_ahead=4)
+        replay.next_frame()
+        replay.close()
+
+        assert not replay._decoding
+        assert replay._decoder is None
+
+    def test_archive(self, tmp_path):
+        rng = np.random.default_rng(6)
+        frames = rng.integers(0, 256, (3, 7, 9, 4), dtype=np.uint8)
+        path = str(tmp_path / b.FrameArchive.default_file_name)
+        with b.FrameArchive.create(path, 3, (7, 9, 4)) as archive:
+            for i, frame in enumerate(frames):
+                archive.write(frame, 1544891730.5 + i)
+
+        replay = b.ReplayFrameSource(str(tmp_path))
+        recorded = list(replay)
+        assert np.array_equal(np.stack([f for f, _ in recorded]), frames)
+        assert [t for _, t in recorded] == [1544891730.5 + i for i in range(3)]
+        replay.close()
+
+    @patch("bot._mss_module")
+    def test_mock_images(self, mss_module, tmp_path):
+        (width, height) = (120, 90)
+        frames = [
+            frame_with_ball(width, height, b.Vector(30 + 10 * i, 45), 10)
+            for i in range(3)
+        ]
+        write_png_recording(str(tmp_path), frames, [1.0, 2.0, 3.0])
+
+        ball_locator = b.BallLocatorWithMockImages(
+            screen_section_of_size(width, height),
+            dataset=str(tmp_path),
+            ball_radius=10,
+        )
+        for i in range(3):
+            location = ball_locator.locate_ball()
+            assert abs(location.x - (30 + 10 * i)) < 1
+            assert abs(location.y - 45) < 1
+            assert ball_locator.frame_time == i + 1.0
+        with pytest.raises(IndexError):
+            ball_locator.locate_ball()
+
+
+class TestFrameSource:
+    def test_is_abstract(self):
+        with pytest.raises(TypeError):
+            b.FrameSource()
+
+    def test_grab_crops_current_frame(self):
+        class CountingFrameSource(b.FrameSource):
+            def advance(self):
+                self._current_frame = np.arange(60, dtype=np.uint8).reshape(
+                    (5, 4, 3)
+                )
+                return 1.0
+
+        frame_source = CountingFrameSource(b.Vector(10, 20))
+        assert frame_source.advance() == 1.0
+        section = b.ScreenSection(
+            b.Vector(11, 22),
+            b.Vector(13, 22),
+            b.Vector(11, 25),
+            b.Vector(13, 25),
+        )
+
+        frame = frame_source.grab(section)
+
+        assert np.array_equal(frame, frame_source._current_frame[2:5, 1:3])
+
+
+class TestSyntheticFrameSource:
+    def test_ballistic_path(self):
+        section = b.ScreenSection(
+            b.Vector(10, 20),
+            b.Vector(210, 20),
+            b.Vector(10, 170),
+            b.Vector(210, 170),
+        )
+        frame_source = b.SyntheticFrameSource(
+            section,
+            position=b.Vector(50, 60),
+            velocity=b.Vector(300, -100),
+            gravity=b.Vector(0, 400),
+            fps=10,
+            ball_radius=8,
+            number_of_frames=3,
+            start_time=100.0,
+        )
+
+        frames = []
+        for i in range(3):
+            assert np.isclose(frame_source.advance(), 100.0 + i / 10)
+            frames.append(frame_source.grab(section))
+        with pytest.raises(IndexError):
+            frame_source.advance()
+
+        assert frames[0].shape == (150, 200, 4)
+        (x, y) = (frame_source.ball_position.x, frame_source.ball_position.y)
+        assert np.allclose((x, y), (110, 48))
+        position = frame_source.position_at(100.1)
+        assert np.allclose((position.x, position.y), (80, 52))
+        # the ball is black at its center and gone from where it was
+        assert (frames[2][28, 100, :3] == 0).all()
+        assert (frames[2][40, 40, :3] == 255).all()
+        assert (frames[0][40, 40, :3] == 0).all()
+
+    def test_locate_ball(self):
+        section = screen_section_of_size(300, 240)
+        frame_source = b.SyntheticFrameSource(
+            section,
+            position=b.Vector(60.3, 180.6),
+            velocity=b.Vector(150, -300),
+            gravity=b.Vector(0, 300),
+            fps=60,
+            ball_radius=15,
+            number_of_frames=30,
+        )
+        locator = b.BallLocator(
+            section, ball_radius=15, frame_source=frame_source
+        )
+
+        for _ in range(30):
+            position = locator.locate_ball()
+            assert almost_equal(position, frame_source.ball_position, 0.1)
+
+    def test_benchmark_synthetic(self):
+        results = b.benchmark_synthetic(
+            fps=60,
+            duration=0.5,
+            pyramid_depth=0,
+            ball_radius=15,
+            screen_section=screen_section_of_size(300, 240),
+        )
+
+        assert results["frames"] == 31
+        assert results["found"] == 1.0
+        assert results["error_p95_px"] < 0.5
+        assert results["frames_per_second"] > 0
+
+
+class TestSharedFrameSet:
+    def test_load_recorded_frames(self, tmp_path):
+        rng = np.random.default_rng(7)
+        frames = rng.integers(0, 256, (12, 7, 9, 3), dtype=np.uint8)
+        times = [1544891730 + 0.037 * i for i in range(12)]
+        write_png_recording(str(tmp_path), frames, times)
+
+        with b.load_recorded_frames(str(tmp_path), workers=2) as frame_set:
+            assert np.array_equal(frame_set.frames, frames)
+            assert np.allclose(frame_set.times, times)
+            attached = b.SharedFrameSet.attach(frame_set.name, frames.shape)
+            assert np.array_equal(attached.frames, frames)
+            attached.close()
+
+
+@patch("bot._mss_module")
+class TestEvaluateSharded:
+    def test_evaluate_sharded(self, mss_module, tmp_path):
+        (width, height) = (300, 240)
+        times = [1544891730 + 0.25 * i for i in range(8)]
+        centers = [b.Vector(50 + 10 * i, 60 + 2 * i * i) for i in range(8)]
+        frames = [frame_with_ball(width, height, c, 45) for c in centers]
+        write_png_recording(str(tmp_path), frames, times)
+
+        kinematics = b.evaluate_sharded(
+            str(tmp_path),
+            workers=3,
+            pyramid_depth=0,
+            screen_section=screen_section_of_size(width, height),
+        )
+
+        assert kinematics.shape == (8, 7)
+        assert np.allclose(kinematics[:, 0], times)
+        assert np.allclose(kinematics[:, 1:3], [(c.x, c.y) for c in centers])
+        assert np.allclose(kinematics[1:, 3], 40, atol=1)
+        assert np.allclose(kinematics[2:, 6], 64, atol=5)
+
+
+class TestStageTimings:
+    def test_percentiles(self):
+        timings = b.StageTimings(("grab", "detection", "kinematics"), size=4)
+        for duration in [0.004, 0.001, 0.002, 0.003, 0.005]:
+            timings.add("grab", duration)
+            timings.add("detection", duration)
+            timings.add("detection", duration)
+            timings.end_iteration()
+
+        assert timings.iterations == 5
+        # the oldest iteration was overwritten
+        assert np.allclose(
+            timings.durations()[:, 0], [0.001, 0.002, 0.003, 0.005]
+        )
+        percentiles = timings.percentiles((0, 50, 100))
+        assert np.allclose(percentiles["grab"], [0.001, 0.0025, 0.005])
+        assert np.allclose(percentiles["detection"], [0.002, 0.005, 0.010])
+        assert np.all(np.isnan(percentiles["kinematics"]))
+        assert "grab ms: p50 2.50" in timings.summary()
+
+    def test_dump_and_load(self, tmp_path):
+        timings = b.StageTimings(("grab", "detection"))
+        for i in range(3):
+            timings.add("grab", 0.001 * i)
+            timings.end_iteration()
+        path = str(tmp_path / "timings.npz")
+
+        timings.dump(path)
+
+        loaded = b.StageTimings.load(path)
+        assert loaded.stages == ("grab", "detection")
+        assert np.allclose(
+            loaded.durations(), timings.durations(), equal_nan=True
+        )
+
+
+class TestReplayBenchmark:
+    @patch("bot._mss_module")
+    def test_benchmark_replay(self, mss_module, tmp_path):
+        (width, height) = (300, 240)
+        centers = [b.Vector(50 + 10 * i, 60 + 2 * i * i) for i in range(6)]
+        frames = [frame_with_ball(width, height, c, 45) for c in centers]
+        write_png_recording(str(tmp_path), frames, [0.1 * i for i in range(6)])
+        section = screen_section_of_size(width, height)
+
+        results = b.benchmark_replay(
+            (str(tmp_path), str(tmp_path / "missing")),
+            pyramid_depth=0,
+            screen_section=section,
+        )
+
+        assert list(results) == [str(tmp_path)]
+        metrics = results[str(tmp_path)]
+        assert metrics["frames"] == 6
+        assert set(b.replay_benchmark_metrics) <= set(metrics)
+        assert 0 < metrics["latency_p50_ms"] <= metrics["latency_p99_ms"]
+        # allocated by the replay, not the resident memory of the process
+        assert 0 < metrics["peak_memory_mb"] < 50
+
+        baseline_path = str(tmp_path / "baseline.json")
+        kwargs = dict(datasets=(str(tmp_path),), screen_section=section)
+        assert b.run_replay_benchmark(baseline_path, **kwargs)
+        assert os.path.isfile(baseline_path)
+        assert b.run_replay_benchmark(baseline_path, tolerance=100, **kwargs)
+
+    def test_benchmark_without_recorded_frames(self, tmp_path):
+        baseline_path = str(tmp_path / "baseline.json")
+
+        passed = b.run_replay_benchmark(
+            baseline_path, datasets=(str(tmp_path / "missing"),)
+        )
+
+        assert not passed
+        assert not os.path.isfile(baseline_path)
+
+    def test_compare(self):
+        baseline = {
+            "recorded_frames": {
+                "frames_per_second": 30.0,
+                "latency_p50_ms": 10.0,
+                "latency_p95_ms": 12.0,
+                "latency_p99_ms": 15.0,
+                "load_seconds": 0.01,
+                "peak_memory_mb": 200.0,
+            }
+        }
+        results = {
+            "recorded_frames": dict(
+                baseline["recorded_frames"],
+                frames_per_second=20.0,
+                latency_p95_ms=13.0,
+            ),
+            "recorded_frames_27fps": baseline["recorded_frames"],
+        }
+
+        regressions = b.compare_replay_benchmark(results, baseline, 0.2)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith("recorded_frames frames_per_second")
+        assert not b.compare_replay_benchmark(baseline, baseline)
+        assert b.compare_replay_benchmark({}, baseline) == [
+            "recorded_frames: not measured"
+        ]
+
+
+class TestAnalyzeFrameTimes:
+    def test_metrics(self):
+        period = 1 / 27
+        frame_numbers = np.array([0, 1, 2, 4, 5, 8, 9], np.float64)
+        jitter = np.array([0, 0.001, -0.001, 0, 0.002, 0, 0])
+        times = 1544891730 + frame_numbers * period + jitter
+
+        metrics = b.analyze_frame_times(times, fps=27)
+
+        assert metrics["frames"] == 7
+        assert metrics["dropped_frames"] == 3
+        assert metrics["gaps"] == [4, 1, 1]
+        assert np.isclose(metrics["period_ms"], 1000 * period)
+        assert np.isclose(metrics["jitter_ms"]["max"], 2.0, atol=1e-3)
+        assert np.isclose(metrics["effective_fps"], 6 / (9 * period))
+        assert np.isclose(metrics["drift_ms"], 0, atol=1e-3)
+        json.dumps(metrics)
+
+    def test_drift(self):
+        # a clock running 1000 ppm slow
+        times = np.arange(1000) * (1 / 27) * 1.001
+
+        metrics = b.analyze_frame_times(times, fps=27)
+
+        assert np.isclose(metrics["drift_ppm"], 1000)
+        assert metrics["dropped_frames"] == 0
+
+    @pytest.mark.parametrize(
+        "times, fps",
+        [
+            ([1544891730.0], None),
+            ([1544891730.0, 1544891730.0, 1544891730.0, 1544891731.0], None),
+            ([1544891730.0, 1544891730.0], 27),
+            ([1544891730.0, 1544891731.0], -27),
+        ],
+    )
+    def test_invalid_times(self, times, fps):
+        with pytest.raises(ValueError):
+            b.analyze_frame_times(times, fps)
+
+    def test_read_time_log(self, tmp_path):
+        times = [1544891730.25, 1544891730.5, 1544891730.75]
+        write_png_recording(str(tmp_path), [], times)
+        path = str(tmp_path / "image_times.log")
+
+        assert list(b.read_time_log(path)) == times
+        assert os.listdir(str(tmp_path)) == ["image_times.log"]
+        cache_path = str(tmp_path / "times.npy")
+        assert list(b.read_time_log(path, cache_path)) == times
+        assert os.path.isfile(cache_path)
+        assert list(b.read_time_log(path, cache_path)) == times
+
+    def test_analyze_time_logs_cache(self, tmp_path):
+        times = [1544891730 + 0.037 * i for i in range(5)]
+        write_png_recording(str(tmp_path), [], times)
+
+        results = b.analyze_time_logs((str(tmp_path),))
+        assert not os.path.isfile(str(tmp_path / "image_times.npy"))
+        cached_results = b.analyze_time_logs((str(tmp_path),), cache=True)
+
+        assert os.path.isfile(str(tmp_path / "image_times.npy"))
+        assert cached_results == results
+
+
+class TestStartup:
+    def test_import_loads_no_backends(self):
+        code = (
+            "import sys, bot; "
+            "print([p for p in ('matplotlib', 'pymouse', 'mss') "
+            "if p in sys.modules])"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=dirname(abspath(b.__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        assert output.strip() == "[]"
+
+    def test_benchmark_startup(self, tmp_path):
+        centers = [b.Vector(400, 500), b.Vector(410, 490)]
+        frames = [frame_with_ball(850, 1090, c, 45) for c in centers]
+        write_png_recording(str(tmp_path), frames, [0.0, 0.037])
+
+        results = b.benchmark_startup(str(tmp_path), runs=1)
+
+        assert results["import"] > 0
+        assert results["engine"] > 0
+        assert results["first_iteration"] > 0
+        assert results["loaded_backends"] == []
+
+
+class MockBallLocator:
+    def __init__(self, positions, times=None):
+        self._positions = list(positions)
+        self._times = None if times is None else list(times)
+        self.located_frames = []
+
+    def grab_frame(self, record_timing=True):
+        if not self._positions:
+            raise IndexError("out of positions")
+        if self._times is None:
+            return (self._positions.pop(0), b.time())
+        return (self._positions.pop(0), self._times.pop(0))
+
+    def locate_ball(self, tracked_ball=None):
+        return self.grab_frame()[0]
+
+    def locate_ball_in_frame(self, frame, tracked_ball=None, frame_time=None):
+        self.located_frames.append(frame)
+        return frame
+
+
+@patch("bot._mss_module")
+class TestBotEngine:
+    def test_start_pipelined(self, mss_module):
+        bot_engine = b.BotEngine(
+            phase_lock=False, ball_tracker="least_squares"
+        )
+        bot_engine._iterations_per_second = 1000
+        positions = [b.Vector(i, 2 * i) for i in range(10)]
+        ball_locator = MockBallLocator(positions)
+        bot_engine._ball_locator = ball_locator
+
+        bot_engine.start_pipelined(number_of_iterations=10, queue_size=20)
+
+        assert ball_locator.located_frames == positions
+        assert bot_engine._ball.position == b.Vector(9, 18)
+        # one grab per processed frame, timed into its own iteration
+        grab_index = bot_engine.timings.stages.index("grab")
+        grabs = bot_engine.timings.durations()[:, grab_index]
+        assert bot_engine.timings.iterations == 10
+        assert not np.isnan(grabs).any()
+
+    def test_start_pipelined_latency_of_replay(self, mss_module, capsys):
+        bot_engine = b.BotEngine(ball_tracker="least_squares")
+        bot_engine._iterations_per_second = 1000
+        positions = [b.Vector(i, 2 * i) for i in range(5)]
+        times = [1544891730 + 0.04 * i for i in range(5)]
+        bot_engine._ball_locator = MockBallLocator(positions, times)
+
+        bot_engine.start_pipelined(number_of_iterations=5, queue_size=20)
+
+        # measured from the capture, not from the recorded frame times
+        output = capsys.readouterr().out
+        latency = re.search(r"latency ms: mean ([0-9.]+)", output)
+        assert float(latency[1]) < 1000
+
+    def test_replay_synthetic_frames(self, mss_module):
+        section = b.android_screen_section()
+        frame_source = b.SyntheticFrameSource(
+            section,
+            position=b.Vector(300, 900),
+            velocity=b.Vector(100, -1200),
+            number_of_frames=10,
+        )
+        bot_engine = b.BotEngine(
+            ball_tracker="least_squares", frame_source=frame_source
+        )
+
+        bot_engine.replay()
+
+        assert bot_engine.timings.iterations == 10
+        assert almost_equal(
+            bot_engine._ball.position, frame_source.ball_position, 0.5
+        )
+
+    def test_start_without_recorded_frames(self, mss_module, tmp_path):
+        time_log = join(str(tmp_path), "image_times.log")
+        with open(time_log, "w") as f:
+            f.write("1544891730.0\n1544891730.037\n")
+
+        frame_source = b._frame_source_instead_of(str(tmp_path))
+        bot_engine = b.BotEngine(
+            ball_tracker="least_squares", frame_source=frame_source
+        )
+        bot_engine.replay(2)
+
+        assert isinstance(frame_source, b.SyntheticFrameSource)
+        assert bot_engine.timings.iterations == 2
+        assert b._frame_source_instead_of(None) is None
+
+    def test_kalman_gravity_estimate(self, mss_module):
+        bot_engine = b.BotEngine()
+        positions = [b.Vector(10 * i, 5 * i * i) for i in range(10)]
+        times = [1544891730 + 0.5 * i for i in range(10)]
+        bot_engine._ball_locator = MockBallLocator(positions, times)
+
+        bot_engine.replay()
+
+        # fitted to the first five positions, which fall at 40 px/s**2
+        assert isinstance(bot_engine._ball, b.KalmanBallTracker)
+        assert np.allclose(components(bot_engine._gravity), (0, 40))
+        ball = bot_engine._ball
+        assert np.allclose(components(ball.velocity), (20, 180), atol=1)
+        assert np.allclose(components(ball.acceleration), (0, 40), atol=1)
+
+    def test_kalman_configured_gravity(self, mss_module):
+        bot_engine = b.BotEngine(gravity=b.Vector(0, 40))
+        positions = [b.Vector(10 * i, 5 * i * i) for i in range(3)]
+        times = [1544891730 + 0.5 * i for i in range(3)]
+        bot_engine._ball_locator = MockBallLocator(positions, times)
+
+        bot_engine.replay()
+
+        assert isinstance(bot_engine._ball, b.KalmanBallTracker)
+        assert bot_engine._gravity == b.Vector(0, 40)
+
+    def test_replay(self, mss_module):
+        bot_engine = b.BotEngine(ball_tracker="least_squares")
+        positions = [b.Vector(10 * i, 5 * i * i) for i in range(10)]
+        times = [1544891730 + 0.5 * i for i in range(10)]
+        bot_engine._ball_locator = MockBallLocator(positions, times)
+
+        assert bot_engine.replay() == 10
+
+        assert bot_engine._ball.position == b.Vector(90, 405)
+        assert bot_engine._ball.position_time == times[-1]
+        assert bot_engine.timings.iterations == 10
+        assert bot_engine.timings.percentiles()["kinematics"][0] >= 0
+        ball = bot_engine._ball
+        assert np.allclose(components(ball.velocity), (20, 180), atol=1e-6)
+        assert np.allclose(components(ball.acceleration), (0, 40), atol=1e-6)